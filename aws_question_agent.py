@@ -1,146 +1,214 @@
 # aws_question_agent.py
 # This is the main orchestration file that coordinates the entire AWS exam question processing pipeline
-# It uses LangGraph to create a workflow that: extracts text from images → analyzes with AI → uploads to Notion
+# It runs three stages at the same time on different images: extracts text from images → analyzes with AI → uploads to Notion
 
 # Import necessary libraries for the workflow
-import os  # For file system operations
-from datetime import datetime  # For timestamp operations (if needed)
+import sys  # For reading image paths from the command line
+import asyncio  # For running the three stages concurrently
+from concurrent.futures import ThreadPoolExecutor  # To run OCR without blocking the other stages
 from typing import TypedDict  # For type hints and data structure definitions
-from langgraph.graph import StateGraph, END  # LangGraph for creating workflow graphs
-import json  # For JSON parsing and manipulation
 
 # Import our custom utility functions
-from utils.ocr import image_to_text  # Function to extract text from images using OCR
-from utils.llm import answer_question_with_llm  # Function to analyze questions using AI
-from utils.notion import upload_question  # Function to upload processed questions to Notion
+from utils.ocr import images_to_texts, warmup as warmup_ocr  # Functions to extract text from images using OCR
+from utils.llm import answer_question_with_llm, warmup_model  # Functions to analyze questions using AI
+from utils.notion import upload_questions  # Function to upload processed questions to Notion
+
+# Maximum number of items waiting between two stages
+# This keeps memory bounded when one stage is faster than the next one
+QUEUE_SIZE = 4
 
 # === Typed State Definition ===
-# This class defines the structure of data that flows between different steps in our workflow
+# This class defines the structure of data that flows between different stages in our pipeline
 # It ensures type safety and makes the code more maintainable
-class GraphState(TypedDict):
+class QuestionState(TypedDict):
     """
-    Defines the data structure that flows through the workflow pipeline.
-    
-    This state object is passed between all workflow nodes and contains
+    Defines the data structure that flows through the pipeline.
+
+    This state object is passed between all pipeline stages and contains
     all the information needed to process an exam question from image to Notion.
     """
-    file_path: list[str]  # Path to the input image file containing the exam question
+    file_path: str  # Path to the input image file containing the exam question
     ocr_text: str  # Raw text extracted from the image using OCR
     question: dict  # Structured question data in JSON format (question + answers + explanations)
 
 
-def get_question_text(state: GraphState) -> GraphState:
+async def ocr_worker(ocr_q: asyncio.Queue, llm_q: asyncio.Queue, executor: ThreadPoolExecutor, batch_size: int):
     """
-    First step: Extracts text from the input image using OCR technology.
-    
-    This function takes an image file containing an exam question and uses
-    Optical Character Recognition (OCR) to convert the visual text into
-    machine-readable text that can be processed by the AI.
-    
+    First stage: Extracts text from the input images using OCR technology.
+
+    This worker takes image paths from ocr_q, groups the ones that are already
+    waiting into a batch, and extracts their text with batched OCR in a worker
+    thread (so the other stages keep running). Each image with text is then sent
+    to the LLM stage.
+
     Args:
-        state (GraphState): Current workflow state containing the image file path
-    
-    Returns:
-        GraphState: Updated state with the extracted text added to ocr_text field
+        ocr_q (asyncio.Queue): Image paths to process, ending with None
+        llm_q (asyncio.Queue): Where the states with extracted text are sent
+        executor (ThreadPoolExecutor): Thread pool used to run the OCR
+        batch_size (int): Maximum number of images read in each OCR batch
     """
-    print("Running OCR...")  # Log the current operation for debugging
-    
-    # Use our OCR utility to extract text from the image
-    # This calls the image_to_text function from utils/ocr.py
-    text = image_to_text(state["file_path"])
-    
-    # Check if any text was actually extracted from the image
-    if not text.strip():
-        print("No text extracted from image.")
-        return state  # Return unchanged state if no text found
-    
-    # Display a preview of the extracted text for debugging
-    print("Question text extracted:")
-    print(text[:500], "...\\n")  # Show first 500 characters
-    
-    # Add the extracted text to our workflow state
-    state["ocr_text"] = text
-    return state
-
-
-def convert_text_to_json(state: GraphState) -> GraphState:
+    loop = asyncio.get_running_loop()
+    done = False
+    while not done:
+        # Wait for the next image, then take the ones already waiting (up to batch_size)
+        batch = []
+        path = await ocr_q.get()
+        while path is not None:
+            batch.append(path)
+            if len(batch) >= batch_size or ocr_q.empty():
+                break
+            path = ocr_q.get_nowait()
+        done = path is None
+        if not batch:
+            continue
+
+        print(f"Running OCR on {len(batch)} image(s)...")  # Log the current operation
+        try:
+            texts = await loop.run_in_executor(executor, images_to_texts, batch)
+        except Exception as e:
+            # Images that can't be loaded are already skipped one by one inside
+            # images_to_texts; this only happens if the OCR engine itself fails
+            print(f"OCR failed for {batch}: {e}")
+            continue
+
+        for path, text in zip(batch, texts):
+            # Check if any text was actually extracted from the image
+            if not text.strip():
+                print(f"No text extracted from {path}.")
+                continue
+
+            # Display a preview of the extracted text for debugging
+            print("Question text extracted:")
+            print(text[:500], "...\n")  # Show first 500 characters
+
+            await llm_q.put({"file_path": path, "ocr_text": text})
+
+
+async def llm_worker(llm_q: asyncio.Queue, notion_q: asyncio.Queue):
     """
-    Second step: Analyzes the extracted text using AI and converts it to structured JSON.
-    
-    This function takes the raw OCR text and sends it to a local AI model (Ollama)
+    Second stage: Analyzes the extracted text using AI and converts it to structured JSON.
+
+    This worker takes the OCR text and sends it to a local AI model (Ollama)
     which analyzes the question, identifies all answer options, determines which
-    are correct, and provides explanations in Spanish for each option.
-    
+    are correct, and provides explanations in Spanish for each option. Several
+    llm_workers run at the same time so the LLM server gets concurrent requests.
+
     Args:
-        state (GraphState): Current workflow state containing the OCR text
-    
-    Returns:
-        GraphState: Updated state with structured question data in JSON format
+        llm_q (asyncio.Queue): States with OCR text, ending with None
+        notion_q (asyncio.Queue): Where the states with structured questions are sent
     """
-    print("Asking local LLM (Ollama) to answer...")  # Log the current operation
-    
-    # Send the OCR text to our AI model for analysis
-    # This calls the answer_question_with_llm function from utils/llm.py
-    question = answer_question_with_llm(state["ocr_text"])
-    
-    # Parse the AI's JSON response and add it to our workflow state
-    # The AI returns a JSON string that we convert to a Python dictionary
-    state["question"] = json.loads(question)
-    
-    print("Ollama Generate the question")  # Confirm successful processing
-    
-    return state
-
-def upload_to_notion(state: GraphState) -> GraphState:
+    while (state := await llm_q.get()) is not None:
+        print(f"Asking local LLM to answer {state['file_path']}...")  # Log the current operation
+        try:
+            # Send the OCR text to our AI model for analysis
+            # This calls the answer_question_with_llm function from utils/llm.py
+            state["question"] = await answer_question_with_llm(state["ocr_text"])
+        except Exception as e:
+            # Skip this question but keep processing the rest
+            print(f"LLM failed for {state['file_path']}: {e}")
+            continue
+
+        await notion_q.put(state)
+
+
+async def notion_worker(notion_q: asyncio.Queue, results: list):
     """
-    Third step: Uploads the processed question data to a Notion page.
-    
-    This function takes the structured question data (question text, answer options,
-    correctness indicators, and explanations) and uploads it to a Notion page
-    in a formatted layout with toggle blocks for each answer option.
-    
+    Third stage: Uploads the processed question data to a Notion page.
+
+    This worker takes the structured questions and uploads all the ones that
+    are already waiting with a single Notion request, in a formatted layout
+    with toggle blocks for each answer option.
+
     Args:
-        state (GraphState): Current workflow state containing the structured question data
-    
+        notion_q (asyncio.Queue): States with structured questions, ending with None
+        results (list): Where the states of the uploaded questions are added
+    """
+    done = False
+    while not done:
+        # Wait for the next question, then take all the ones already waiting
+        batch = []
+        state = await notion_q.get()
+        while state is not None:
+            batch.append(state)
+            if notion_q.empty():
+                break
+            state = notion_q.get_nowait()
+        done = state is None
+        if not batch:
+            continue
+
+        print(f"Uploading {len(batch)} question(s) to Notion...")  # Log the current operation
+        try:
+            # This calls the upload_questions function from utils/notion.py
+            await upload_questions([s["question"] for s in batch])
+        except Exception as e:
+            print(f"Notion upload failed for {[s['file_path'] for s in batch]}: {e}")
+            continue
+
+        results.extend(batch)
+
+
+# === Pipeline Execution ===
+async def run_batch(paths: list[str], max_concurrency: int = 4, batch_size: int = 8) -> list[QuestionState]:
+    """
+    Runs the complete pipeline on several images at the same time.
+
+    The three stages (OCR → AI Analysis → Notion Upload) run concurrently and
+    are connected by queues: while one image is being analyzed by the LLM, the
+    next images are already in the OCR stage and the previous ones are being
+    uploaded. The total time is close to the time of the slowest stage instead
+    of the sum of the three.
+
+    Args:
+        paths (list[str]): Paths to the image files to process
+        max_concurrency (int): Number of questions sent to the LLM at once (default: 4)
+        batch_size (int): Maximum number of images read in each OCR batch (default: 8)
+
     Returns:
-        GraphState: Updated state (no changes made, just confirms upload completion)
+        list[QuestionState]: Final state of every uploaded question, in upload order
     """
-    print("Uploading to Notion...")  # Log the current operation
-    
-    # Upload the structured question data to Notion
-    # This calls the upload_question function from utils/notion.py
-    upload_question(state["question"])
-    
-    return state
-
-# === Workflow Graph Definition ===
-# Create a state graph that orchestrates the entire question processing pipeline
-# This defines the sequence of operations and how data flows between them
-workflow = StateGraph(GraphState)
-
-# Add workflow nodes (processing steps)
-# Each node represents a function that processes the state and passes it to the next step
-workflow.add_node("get_question_text", get_question_text)  # Step 1: OCR extraction
-workflow.add_node("convert_text_to_json", convert_text_to_json)  # Step 2: AI analysis
-workflow.add_node("upload_to_notion", upload_to_notion)  # Step 3: Notion upload
-
-# Define the workflow execution order (pipeline flow)
-workflow.set_entry_point("get_question_text")  # Start with OCR text extraction
-workflow.add_edge("get_question_text", "convert_text_to_json")  # Then analyze with AI
-workflow.add_edge("convert_text_to_json", "upload_to_notion")  # Then upload to Notion
-workflow.add_edge("upload_to_notion", END)  # End the workflow after upload
-
-# Compile the workflow graph into an executable pipeline
-# This creates the final workflow object that can process questions
-graph = workflow.compile()
-
-# === Workflow Execution ===
-# Define the input for our workflow (the image file to process)
-input_state = {"file_path": "images/Example.png"}
-
-# Execute the complete workflow pipeline
-# This will run all three steps in sequence: OCR → AI Analysis → Notion Upload
-result_state = graph.invoke(input_state)
-
-# Optionally print the final result (commented out to reduce output)
-#print("Final result: ", result_state)
\ No newline at end of file
+    # Queues between the stages; the paths queue holds a full OCR batch
+    ocr_q = asyncio.Queue(maxsize=batch_size)
+    llm_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    notion_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    results = []
+
+    # Start loading the LLM while the OCR models are being loaded
+    warmup = asyncio.create_task(warmup_model())
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Load the OCR models once before the first batch
+        await asyncio.get_running_loop().run_in_executor(executor, warmup_ocr)
+
+        # Start the three stages
+        ocr_task = asyncio.create_task(ocr_worker(ocr_q, llm_q, executor, batch_size))
+        llm_tasks = [asyncio.create_task(llm_worker(llm_q, notion_q)) for _ in range(max_concurrency)]
+        notion_task = asyncio.create_task(notion_worker(notion_q, results))
+
+        # Feed the image paths into the pipeline, followed by the end marker
+        for path in paths:
+            await ocr_q.put(path)
+        await ocr_q.put(None)
+
+        # Stop each stage once the previous one has finished
+        await ocr_task
+        for _ in llm_tasks:
+            await llm_q.put(None)
+        await asyncio.gather(*llm_tasks)
+        await notion_q.put(None)
+        await notion_task
+
+    await warmup
+    return results
+
+
+if __name__ == "__main__":
+    # Define the input for our pipeline (the image files to process)
+    # Image paths can be passed on the command line; default to the example image
+    image_paths = sys.argv[1:] or ["images/Example.png"]
+
+    # Execute the complete pipeline for every image
+    result_states = asyncio.run(run_batch(image_paths))
+
+    # Optionally print the final result (commented out to reduce output)
+    #print("Final result: ", result_states)
@@ -1,47 +1,78 @@
 # main.py
 import argparse
+import asyncio
+import glob
+import json
 import os
-from utils.ocr import image_to_text
-from utils.llm import answer_question_with_llm
-from utils.notion import upload_question
+from utils.ocr import images_to_texts, warmup as warmup_ocr
+from utils.llm import answer_questions_batch, warmup_model
+from utils.notion import upload_questions
 from datetime import datetime
 
-def save_markdown(content: str, out_dir="outputs"):
+def save_markdown(content: str, out_dir="outputs", name: str = None):
     os.makedirs(out_dir, exist_ok=True)
-    fname = f"answer_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.md"
-    path = os.path.join(out_dir, fname)
+    stem = name or f"answer_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    path = os.path.join(out_dir, f"{stem}.md")
     with open(path, "w", encoding="utf-8") as f:
         f.write(content)
     return path
 
-def main(image_path: str, lang="en", use_gpu: bool = True, notion_upload: bool = True):
-    print("Running OCR...")
-    text = image_to_text(image_path, lang_list=[lang], gpu=use_gpu)
-    if not text.strip():
-        print("No text extracted from image.")
+def expand_paths(patterns: list[str]) -> list[str]:
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(matches)
+    return paths
+
+async def main_async(image_paths: list[str], lang="en", use_gpu: bool = True, notion_upload: bool = True):
+    # Load the LLM in the background while OCR is running
+    warmup = asyncio.create_task(warmup_model())
+    await asyncio.to_thread(warmup_ocr, lang_list=[lang], gpu=use_gpu)
+
+    print(f"Running OCR on {len(image_paths)} image(s)...")
+    ocr_texts = await asyncio.to_thread(images_to_texts, image_paths, lang_list=[lang], gpu=use_gpu)
+
+    texts = {}
+    for image_path, text in zip(image_paths, ocr_texts):
+        if not text.strip():
+            print(f"No text extracted from {image_path}.")
+            continue
+
+        print("Question text extracted:")
+        print(text[:500], "...\n")
+        texts[image_path] = text
+
+    await warmup
+    if not texts:
         return
 
-    print("Question text extracted:")
-    print(text[:500], "...\n")
+    print(f"Asking local LLM (Ollama) to answer {len(texts)} question(s)...")
+    results = await answer_questions_batch(list(texts.values()))
 
-    print("Asking local LLM (Ollama) to answer...")
-    answer = answer_question_with_llm(text)
-    md = f"# Question\n\n{text}\n\n# Answer\n\n{answer}\n"
+    answers = []
+    for (image_path, text), answer in zip(texts.items(), results):
+        # Skip the questions the LLM failed to answer, keep the rest
+        if isinstance(answer, Exception):
+            print(f"LLM failed for {image_path}: {answer}")
+            continue
+        answers.append(answer)
 
-    saved = save_markdown(md)
-    print("Saved markdown to:", saved)
+        answer_json = json.dumps(answer, ensure_ascii=False, indent=2)
+        md = f"# Question\n\n{text}\n\n# Answer\n\n{answer_json}\n"
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        saved = save_markdown(md, name=f"answer_{name}")
+        print("Saved markdown to:", saved)
 
-    if notion_upload:
+    if notion_upload and answers:
         print("Uploading to Notion...")
-        page = upload_question(md, title=os.path.basename(saved))
-        print("Uploaded page:", page.get("id"))
+        await upload_questions(answers)
 
 if __name__ == "__main__":
-    # parser = argparse.ArgumentParser()
-    # parser.add_argument("image", help="Path to question image")
-    # parser.add_argument("--lang", default="en")
-    # parser.add_argument("--no-gpu", action="store_true", help="Disable GPU for OCR")
-    # parser.add_argument("--no-notion", action="store_true", help="Skip Notion upload")
-    # args = parser.parse_args()
-    # main(args.image, lang=args.lang, use_gpu=not args.no_gpu, notion_upload=not args.no_notion)
-    print(image_to_text("images/Example.png"))
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="+", help="Paths or glob patterns of question images")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--no-gpu", action="store_true", help="Disable GPU for OCR")
+    parser.add_argument("--no-notion", action="store_true", help="Skip Notion upload")
+    args = parser.parse_args()
+    paths = expand_paths(args.images)
+    asyncio.run(main_async(paths, lang=args.lang, use_gpu=not args.no_gpu, notion_upload=not args.no_notion))
@@ -3,104 +3,168 @@
 # It uses Ollama to run a local LLM that processes question text and provides structured answers
 
 # Import necessary libraries for LLM interaction
+import os  # For accessing environment variables
+import asyncio  # To run several LLM requests concurrently
+from dotenv import load_dotenv  # To load environment variables from .env file
 from langchain_ollama import ChatOllama  # Interface to communicate with Ollama LLM
-from langchain_core.prompts import PromptTemplate  # Tool to create structured prompts
+from langchain_core.prompts import ChatPromptTemplate  # Tool to create structured prompts
+from pydantic import BaseModel, Field  # To describe the JSON structure the AI must return
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Choose which local LLM server answers the questions:
+# - "ollama" (default): the Ollama server
+# - "llamacpp": a llama.cpp `llama-server` with its OpenAI-compatible API,
+#   which batches concurrent requests together (continuous batching)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "ollama")
+
+# Address of the llama.cpp server (only used with LLM_BACKEND=llamacpp)
+LLAMACPP_BASE_URL = os.environ.get("LLAMACPP_BASE_URL", "http://localhost:8080/v1")
 
 # Define which AI model to use for question analysis
-# llama3.2:3b is a lightweight version of the Llama model that runs locally
-model_name = "llama3.2:3b"
+# aws-q4 is a 4-bit (Q4_K_M) build of llama3.2:3b created from the Modelfile
+# in the project root (`ollama create aws-q4 -f Modelfile`)
+model_name = "aws-q4"
 
-# Create an instance of the ChatOllama model
-# This object will be used to send questions to the AI and get responses
-model = ChatOllama(model=model_name)
+# Name of the model served by llama.cpp (a Q4_K_M GGUF build of the same model)
+llamacpp_model_name = "llama-3.2-3b"
 
-# Define the prompt template that instructs the AI how to analyze questions
-# This template provides detailed instructions for processing exam questions
-prompt = PromptTemplate(
-    # Specify what variables can be inserted into this template
-    input_variables=["question_text"],
+
+def create_model(max_tokens: int = None):
+    """
+    Creates the chat model for the configured LLM backend.
     
-    # The actual prompt text that will be sent to the AI
-    # This gives the AI specific instructions on how to process exam questions
-    template="""
-        You are an expert exam question analyzer. 
-        You will receive text extracted from an image of a multiple-choice question (with options like A, B, C, D).
-
-        Your job:
-        1. Read the question and its answer options carefully.
-        2. Extract **all answer options (A, B, C, D, etc.)** from the text.
-        3. For **each option**, indicate whether it is correct (`true`) or incorrect (`false`).
-        4. Provide a short explanation **in Spanish** for every option (why it is correct or incorrect).
-        5. Return the output **strictly** in the following JSON format (include ALL options, not just the correct one):
-
-        {{
-            "question": "Here is the question text without the options",
-            "answer": [
-                {{
-                    "option": "Option A text in english",
-                    "isCorrect": true or false,
-                    "explanation": "Explanation in Spanish"
-                }},
-                {{
-                    "option": "Option B text in english",
-                    "isCorrect": true or false,
-                    "explanation": "Explanation in Spanish"
-                }},
-                {{
-                    "option": "Option C text in english",
-                    "isCorrect": true or false,
-                    "explanation": "Explanation in Spanish"
-                }},
-                {{
-                    "option": "Option D text in english",
-                    "isCorrect": true or false,
-                    "explanation": "Explanation in Spanish"
-                }}
-            ]
-        }}
-
-        Rules:
-        - You must always include ALL options (A, B, C, D) in the array.
-        - If the text has more or fewer options, adjust accordingly.
-        - Do NOT include extra explanations or text outside the JSON.
-        - Use clear Spanish grammar and reasoning.
-        - Ignore unrelated words like "hideAnswer", "Explanation", or "Answer:".
-
-        ---
-
-        Now analyze the following question and generate the JSON response:
-
-
-        {question_text}
+    Args:
+        max_tokens (int): Maximum number of tokens to generate (default: no limit)
+    
+    Returns:
+        BaseChatModel: ChatOllama or ChatOpenAI instance pointing to the local server
     """
-)
+    if LLM_BACKEND == "llamacpp":
+        # Imported here so the Ollama setup doesn't need langchain-openai installed
+        from langchain_openai import ChatOpenAI
+        # llama-server doesn't check the API key, but the client requires one
+        return ChatOpenAI(base_url=LLAMACPP_BASE_URL, model=llamacpp_model_name,
+                          api_key="sk-no", max_tokens=max_tokens)
+    
+    # keep_alive=-1 asks Ollama to keep the model weights in memory indefinitely,
+    # so later runs don't pay the model loading time again
+    return ChatOllama(model=model_name, keep_alive=-1, num_predict=max_tokens)
+
+
+# === Answer Structure ===
+# These classes describe the exact JSON the AI must return. The LLM server uses
+# them to constrain the generation, so the output is always valid JSON with
+# these fields (no extra text around it and no parsing errors)
+class Option(BaseModel):
+    """One answer option of the exam question."""
+    option: str = Field(description="Option text in English")
+    isCorrect: bool = Field(description="Whether this option is correct")
+    explanation: str = Field(description="Short explanation in Spanish")
+
+
+class Answer(BaseModel):
+    """The analyzed exam question with all of its answer options."""
+    question: str = Field(description="Question text without the options")
+    answer: list[Option] = Field(description="All answer options (A, B, C, D...)")
+
+
+# Create an instance of the chat model
+# This object will be used to send questions to the AI and get responses
+model = create_model()
+
+# Same model, but constrained to return an Answer object instead of free text
+structured_model = model.with_structured_output(Answer, method="json_schema")
+
+# Fixed instructions that are the same for every question
+# They go in a separate system message so the beginning of every request is
+# byte-identical, which lets the LLM server reuse its cached processing of
+# these tokens (prompt cache) instead of processing them again each time
+STATIC_INSTRUCTIONS = """You are an expert exam question analyzer.
+You receive OCR text of a multiple-choice question. Return the question and one "answer" item per option (A, B, C, D...),
+saying whether it is correct, with a short explanation in Spanish.
+Ignore unrelated words like "hideAnswer", "Explanation" or "Answer:"."""
 
-def answer_question_with_llm(question_text: str) -> str:
+# Define the prompt template that instructs the AI how to analyze questions
+# It is kept short on purpose: every extra line adds time to each request
+prompt = ChatPromptTemplate.from_messages([
+    ("system", STATIC_INSTRUCTIONS),  # Same for every question (cached by the server)
+    ("user", "{question_text}"),      # The question to analyze
+])
+
+async def answer_question_with_llm(question_text: str) -> dict:
     """
     Analyzes an exam question using the LLM and returns structured JSON response.
     
     This function takes raw question text (usually extracted from an image via OCR),
     sends it to the AI model with specific instructions, and gets back a structured
-    JSON response containing the question, all answer options, correctness indicators,
+    response containing the question, all answer options, correctness indicators,
     and explanations in Spanish.
     
+    The request is sent asynchronously so several questions can be in flight at
+    the same time (see answer_questions_batch).
+    
     Args:
         question_text (str): Raw text of the exam question including all answer options
                            (typically extracted from an image using OCR)
     
     Returns:
-        str: JSON-formatted string containing:
+        dict: Dictionary containing:
              - question: The main question text
-             - answer: Array of all answer options with correctness and explanations
+             - answer: List of all answer options with correctness and explanations
     """
     # Fill the prompt template with the actual question text
-    # This replaces {question_text} in the template with our actual question
-    prompt_filled = prompt.format(question_text=question_text)
+    # This builds the system message plus a user message with our actual question
+    messages = prompt.format_messages(question_text=question_text)
+    
+    # Send the messages to the AI model and wait for the response
+    # The model is constrained to the Answer structure, so we get a parsed object
+    response = await structured_model.ainvoke(messages)
+    
+    # Convert the Answer object into a plain dictionary for the next steps
+    return response.model_dump()
+
+
+async def answer_questions_batch(question_texts: list[str]) -> list[dict]:
+    """
+    Analyzes several exam questions concurrently with the LLM.
     
-    # Send the complete prompt to the AI model and get the response
-    # The model will analyze the question and return structured JSON
-    response = model.invoke(prompt_filled)
+    All requests are sent to the LLM server at once so the network round-trips
+    overlap. Ollama serves up to OLLAMA_NUM_PARALLEL requests in parallel, while
+    llama.cpp merges up to `-np` requests into the same batch; the rest are
+    queued by the server.
+    
+    Args:
+        question_texts (list[str]): Raw text of each exam question
     
-    # Return the AI's response, removing any extra whitespace
-    # The response should be a JSON string with question analysis
-    return response.content.strip()
\ No newline at end of file
+    Returns:
+        list[dict | Exception]: Analyzed questions, in the same order as question_texts.
+            A question that failed (e.g. invalid structured output) gets its
+            exception instead, so one failure doesn't lose the other answers
+    """
+    return await asyncio.gather(*(answer_question_with_llm(text) for text in question_texts),
+                                return_exceptions=True)
+
+
+async def warmup_model() -> bool:
+    """
+    Loads the LLM into memory before the first real question arrives.
+    
+    The LLM server only loads the model weights when the first request is received,
+    which adds several seconds to the first question. This sends a tiny request
+    (limited to a single output token) so the model is already loaded when the
+    real questions are sent. It can run at the same time as the OCR step.
+    
+    Returns:
+        bool: True if the model was loaded, False if the server could not be reached
+    """
+    # Same model with a one-token answer limit, so the warmup itself is fast
+    warmup = create_model(max_tokens=1)
+    try:
+        await warmup.ainvoke("ok")
+    except Exception as e:
+        # The warmup is only an optimization; real requests will report the error
+        print(f"LLM warmup failed: {e}")
+        return False
+    return True
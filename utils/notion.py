@@ -4,7 +4,7 @@
 
 # Import necessary libraries
 import os  # For accessing environment variables
-from PyToNotion.pyNotion import pyNotion  # Library to interact with Notion API
+from notion_client import AsyncClient  # Official asynchronous Notion API client
 from dotenv import load_dotenv  # To load environment variables from .env file
 
 # Load environment variables from .env file
@@ -19,17 +19,21 @@ NOTION_TOKEN = os.environ.get("NOTION_TOKEN")
 # This is the Notion page that will contain all our AWS exam questions
 NOTION_PARENT = os.environ.get("NOTION_PARENT_PAGE_ID")
 
-# Create a Notion client instance using our API token
-# This object will be used to make API calls to Notion
-notion = pyNotion(NOTION_TOKEN)
+# Maximum number of blocks that Notion accepts in a single append request
+NOTION_MAX_CHILDREN = 100
+
+# Create an asynchronous Notion client instance using our API token
+# This object will be used to make API calls to Notion without blocking
+notion = AsyncClient(auth=NOTION_TOKEN)
 
 def build_notion_payload(question_data: dict):
     """
     Builds a Notion-compatible payload from question data.
     
     This function takes exam question data and converts it into the specific
-    format that Notion's API expects. It creates toggle blocks for each answer
-    option, with correct answers in green and incorrect ones in red.
+    format that Notion's API expects. It creates a heading with the question
+    followed by toggle blocks for each answer option, with correct answers in
+    green and incorrect ones in red.
     
     Args:
         question_data (dict): Dictionary containing:
@@ -97,13 +101,15 @@ def build_notion_payload(question_data: dict):
         toggles.append(toggle)
 
     # Build the complete payload structure for Notion API
-    # This creates a numbered list item containing the question and all answer toggles
+    # The question is a heading and the answer toggles are placed right after it
+    # at the same level, instead of nested inside a list item, which keeps the
+    # block tree shallow and the payload small
     notion_payload = {
         "children": [  # Array of blocks to be added to the page
             {
                 "object": "block",
-                "type": "numbered_list_item",  # Creates an automatically numbered item
-                "numbered_list_item": {
+                "type": "heading_3",  # A small heading for the question
+                "heading_3": {
                     # The main question text
                     "rich_text": [
                         {
@@ -112,11 +118,11 @@ def build_notion_payload(question_data: dict):
                                 "content": question_data["question"]  # Display the question
                             }
                         }
-                    ],
-                    # All the answer option toggles go inside this numbered item
-                    "children": toggles
+                    ]
                 }
-            }
+            },
+            # All the answer option toggles follow the question heading
+            *toggles
         ]
     }
 
@@ -124,7 +130,34 @@ def build_notion_payload(question_data: dict):
     return notion_payload
 
 
-def upload_question(question_data: dict):
+def build_batch_payload(questions: list[dict]) -> list[dict]:
+    """
+    Builds Notion payloads that contain the blocks of several questions.
+    
+    The blocks of every question are concatenated into a single children list,
+    which is split into chunks of NOTION_MAX_CHILDREN top-level blocks (the
+    maximum Notion accepts in one request).
+    
+    Args:
+        questions (list[dict]): Question data dictionaries
+            (same format as described in build_notion_payload)
+    
+    Returns:
+        list[dict]: Notion API payloads, one per request to send
+    """
+    # Concatenate the blocks of all the questions, keeping their order
+    children = []
+    for question_data in questions:
+        children.extend(build_notion_payload(question_data)["children"])
+    
+    # Split the blocks into chunks that fit in a single request
+    return [
+        {"children": children[start:start + NOTION_MAX_CHILDREN]}
+        for start in range(0, len(children), NOTION_MAX_CHILDREN)
+    ]
+
+
+async def upload_question(question_data: dict):
     """
     Uploads a single exam question to the Notion page.
     
@@ -147,7 +180,33 @@ def upload_question(question_data: dict):
     
     # Send the formatted data to Notion API
     # This adds the question as new blocks to our parent page
-    notion.append_block_children(NOTION_PARENT, notion_payload)
+    await notion.blocks.children.append(block_id=NOTION_PARENT, children=notion_payload["children"])
+    
+    # Return True to indicate successful upload
+    return True
+
+
+async def upload_questions(questions: list[dict]):
+    """
+    Uploads several exam questions to the Notion page with as few requests as possible.
+    
+    All questions are merged into a single list of blocks (see build_batch_payload)
+    and sent with one API call per NOTION_MAX_CHILDREN top-level blocks, instead
+    of one call per question. Each question takes 1 + its number of options
+    blocks (5 for a 4-option question), so one call covers about 20 questions.
+    A chunk boundary can fall inside a question, putting its heading in one call
+    and some of its toggles in the next; the calls are sent one after the other,
+    so the blocks still keep their order on the page.
+    
+    Args:
+        questions (list[dict]): Question data dictionaries
+            (same format as described in build_notion_payload)
+    
+    Returns:
+        bool: True if all uploads were successful
+    """
+    for notion_payload in build_batch_payload(questions):
+        await notion.blocks.children.append(block_id=NOTION_PARENT, children=notion_payload["children"])
     
     # Return True to indicate successful upload
-    return True
\ No newline at end of file
+    return True
@@ -3,51 +3,268 @@
 # It processes exam question images and converts them to readable text for analysis
 
 # Import necessary libraries for image processing and OCR
+import os  # For accessing environment variables
+import threading  # To make sure the OCR model is only loaded once
+from concurrent.futures import ThreadPoolExecutor  # To preprocess several images in parallel
 import cv2  # OpenCV for image processing and manipulation
 import numpy as np  # NumPy for numerical operations on image arrays
+import torch  # PyTorch, used by EasyOCR to run its models
 import easyocr  # EasyOCR library for text recognition from images
-from PIL import Image  # Python Imaging Library for image format conversions
 from typing import List  # Type hints for better code documentation
+from dotenv import load_dotenv  # To load environment variables from .env file
 
-# Global variable to store the OCR reader instance
-# We initialize it once to avoid reloading the model multiple times (which is slow)
-_reader = None
+# Load environment variables from .env file
+load_dotenv()
+
+# Choose which OCR engine extracts the text:
+# - "easyocr" (default): EasyOCR models running on PyTorch
+# - "paddle": PaddleOCR PP-OCRv5. Requires `pip install paddleocr paddlepaddle`
+# - "onnx": EasyOCR models exported to ONNX and run on ONNX Runtime with the
+#   OpenVINO execution provider (CPU only). Requires `pip install onnxruntime-openvino`
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "easyocr")
+
+# Use PaddleOCR's high-performance inference (set OCR_PADDLE_HPI=1), which picks
+# the fastest available backend (OpenVINO, ONNX Runtime, TensorRT) and FP16.
+# It needs an extra plugin (`paddleocr install_hpi_deps cpu` or `gpu`) that may
+# not support every Python version, so it is off by default
+OCR_PADDLE_HPI = os.environ.get("OCR_PADDLE_HPI", "0") == "1"
+
+# Save the intermediate preprocessed images to outputs/ (set DEBUG_OCR=1)
+# Writing them costs tens of milliseconds per image, so it is off by default
+DEBUG_OCR = os.environ.get("DEBUG_OCR") == "1"
+if DEBUG_OCR:
+    # Create the debug folder once, instead of letting every write fail silently
+    os.makedirs("outputs", exist_ok=True)
+
+# Maximum noise level (median absolute Laplacian, see _noise_level) of an image
+# that is thresholded without denoising. Measured at 1600px width:
+# - images/Example.png and images/Prueba.png: 0 (also 0 after JPEG quality 70)
+# - the same screenshots with Gaussian noise: 5 (sigma=1), 9 (sigma=2),
+#   20 (sigma=5), 68 (sigma=20)
+# Clean screenshots are mostly flat background, so their median is 0, while
+# noise moves almost every pixel. The variance of the Laplacian can't be used
+# here: sharp text and noise both increase it
+MAX_CLEAN_NOISE = 3
+
+# Only every NOISE_SAMPLE_STEP-th row and column is used to estimate the noise,
+# which keeps the estimate (~1ms) cheaper than the blur it can skip
+NOISE_SAMPLE_STEP = 4
+
+# Run the EasyOCR models in half precision (FP16) on CUDA GPUs (set OCR_FP16=1)
+# Off by default until its accuracy is checked against FP32 on real images
+OCR_FP16 = os.environ.get("OCR_FP16", "0") == "1"
+
+# Cache of OCR reader instances, one per (backend, languages, gpu) combination
+# We initialize each one once to avoid reloading the model multiple times (which is slow)
+_readers = {}
+
+# Lock used only while a reader is being created, so two threads processing
+# images at the same time can't both load the model (~100MB of weights each)
+_reader_lock = threading.Lock()
+
+class _Fp16Module(torch.nn.Module):
+    """
+    Runs a PyTorch model in half precision (FP16) on a CUDA GPU.
+    
+    The weights are stored in FP16 (half the memory traffic) and the forward
+    pass runs under autocast, so convolutions and matrix products use the GPU
+    Tensor Cores. Outputs are converted back to FP32 because EasyOCR processes
+    them with OpenCV, which doesn't support FP16 arrays.
+    """
+    
+    def __init__(self, module: torch.nn.Module):
+        super().__init__()
+        self.module = module.half()
+    
+    def forward(self, *args):
+        with torch.autocast("cuda", dtype=torch.float16):
+            outputs = self.module(*args)
+        if isinstance(outputs, tuple):
+            return tuple(output.float() for output in outputs)
+        return outputs.float()
+
+def _create_reader(lang_list, gpu: bool):
+    """
+    Creates a new OCR reader for the configured OCR_BACKEND.
+    
+    Args:
+        lang_list (list): List of language codes for text recognition
+        gpu (bool): Whether to use GPU acceleration if available
+    
+    Returns:
+        easyocr.Reader or PaddleOCR: New OCR reader instance (the "onnx" backend
+        returns an easyocr.Reader whose models run on ONNX Runtime)
+    """
+    if OCR_BACKEND == "paddle":
+        # Imported here so the default EasyOCR setup doesn't need PaddleOCR installed
+        from paddleocr import PaddleOCR
+        return PaddleOCR(
+            ocr_version="PP-OCRv5",
+            lang=lang_list[0],
+            device="gpu" if gpu else "cpu",
+            enable_hpi=OCR_PADDLE_HPI,  # Pick the fastest inference backend automatically
+            enable_mkldnn=True,  # Use oneDNN kernels when running on CPU
+            # Exam screenshots are already flat and upright, skip these extra models
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_textline_orientation=False,
+        )
+    
+    if OCR_BACKEND == "onnx":
+        # Imported here so the default EasyOCR setup doesn't need ONNX Runtime installed
+        from utils.ocr_onnx import use_onnx_runtime
+        # The ONNX models run on the CPU and can't be exported once quantized
+        reader = easyocr.Reader(list(lang_list), gpu=False, quantize=False)
+        return use_onnx_runtime(reader)
+    
+    # Create the EasyOCR reader with specified languages and GPU setting
+    # First initialization is slow as it downloads and loads the model
+    reader = easyocr.Reader(list(lang_list), gpu=gpu)
+    
+    # On CUDA GPUs, switch the detector and recognizer to FP16
+    if OCR_FP16 and reader.device == "cuda":
+        reader.detector = _Fp16Module(reader.detector)
+        reader.recognizer = _Fp16Module(reader.recognizer)
+    return reader
+
+def _read_text(reader, img: np.ndarray) -> list:
+    """
+    Runs the OCR reader on an image and returns the recognized text pieces.
+    
+    Args:
+        reader: OCR reader returned by init_reader
+        img (np.ndarray): Image to read
+    
+    Returns:
+        list[str]: Text pieces found in the image, in reading order
+    """
+    if OCR_BACKEND == "paddle":
+        # PaddleOCR expects a 3-channel (BGR) image
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        results = reader.predict(img)
+        return [text for res in results for text in res["rec_texts"]]
+    
+    # detail=0 returns only text (no bounding boxes or confidence scores)
+    # paragraph=False skips merging boxes into paragraphs: exam questions are
+    # short lines, and the lines are joined with newlines afterwards anyway
+    # decoder="greedy" uses greedy CTC decoding, much faster than beam search
+    return reader.readtext(img, detail=0, paragraph=False, decoder="greedy",
+                           batch_size=8, workers=0)
+
+def _read_texts(reader, imgs: list, batch_size: int) -> list:
+    """
+    Runs the OCR reader on several images at once.
+    
+    The images are sent to the models in batches, so the GPU runs one forward
+    pass per batch instead of one per image.
+    
+    Args:
+        reader: OCR reader returned by init_reader
+        imgs (list[np.ndarray]): Images to read
+        batch_size (int): Number of images (or text crops) per forward pass
+    
+    Returns:
+        list[list[str]]: Text pieces found in each image, in the same order as imgs
+    """
+    if OCR_BACKEND == "paddle":
+        # PaddleOCR expects 3-channel (BGR) images and batches them by itself
+        imgs = [cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img for img in imgs]
+        return [res["rec_texts"] for res in reader.predict(imgs)]
+    
+    # readtext_batched needs all images to have the same size, so smaller images
+    # are padded with white (the background color after preprocessing)
+    # Padding keeps the aspect ratio, so the text is not distorted
+    height = max(img.shape[0] for img in imgs)
+    width = max(img.shape[1] for img in imgs)
+    padded = [
+        cv2.copyMakeBorder(img, 0, height - img.shape[0], 0, width - img.shape[1],
+                           cv2.BORDER_CONSTANT, value=255)
+        for img in imgs
+    ]
+    return reader.readtext_batched(padded, batch_size=batch_size, detail=0, paragraph=False,
+                                   decoder="greedy", workers=0)
 
 def init_reader(lang_list=["en"], gpu: bool = True):
     """
-    Initializes the EasyOCR reader with specified languages and GPU settings.
+    Initializes the OCR reader with specified languages and GPU settings.
     
     This function creates an OCR reader instance that can recognize text in the
     specified languages. The reader is cached globally to avoid reloading the
-    model on every OCR operation, which would be very slow.
+    model on every OCR operation, which would be very slow. It is safe to call
+    from several threads at once: once the reader exists, no lock is taken.
     
     Args:
         lang_list (list): List of language codes for text recognition (default: ["en"])
         gpu (bool): Whether to use GPU acceleration if available (default: True)
     
     Returns:
-        easyocr.Reader: Initialized OCR reader instance
+        easyocr.Reader or PaddleOCR: Initialized OCR reader instance
     """
-    global _reader
-    # Only initialize the reader if it hasn't been created yet
-    # This prevents reloading the model multiple times
-    if _reader is None:
-        # Create the EasyOCR reader with specified languages and GPU setting
-        # First initialization is slow as it downloads and loads the model
-        _reader = easyocr.Reader(lang_list, gpu=gpu)
-    return _reader
+    key = (OCR_BACKEND, tuple(lang_list), gpu)
+    
+    # Fast path: the reader was already created
+    reader = _readers.get(key)
+    if reader is None:
+        with _reader_lock:
+            # Check again: another thread may have created it while we waited
+            reader = _readers.get(key)
+            if reader is None:
+                reader = _create_reader(lang_list, gpu)
+                _readers[key] = reader
+    return reader
 
-def preprocess_image(path: str, resize_width: int = 1600) -> np.ndarray:
+def warmup(lang_list=["en"], gpu: bool = True):
+    """
+    Loads the OCR reader and runs it once on a blank image.
+    
+    The first OCR call is slower than the rest because the detector and
+    recognizer models are loaded and their GPU kernels are prepared. Calling
+    this at startup moves that cost out of the first real image.
+    
+    Args:
+        lang_list (list): List of language codes for text recognition (default: ["en"])
+        gpu (bool): Whether to use GPU acceleration if available (default: True)
+    """
+    reader = init_reader(lang_list=lang_list, gpu=gpu)
+    # A small white image with a black bar, so both models actually run
+    dummy = np.full((64, 256), 255, dtype=np.uint8)
+    dummy[24:40, 16:240] = 0
+    _read_text(reader, dummy)
+
+def _noise_level(gray: np.ndarray) -> int:
+    """
+    Estimates how noisy a grayscale image is.
+    
+    Uses the median of the absolute Laplacian of a subsampled image. The median
+    ignores the text edges (a small part of the image), so it only grows when
+    the background itself is noisy.
+    
+    Args:
+        gray (np.ndarray): Grayscale image
+    
+    Returns:
+        int: Median absolute Laplacian (0 for clean digital screenshots)
+    """
+    sample = gray[::NOISE_SAMPLE_STEP, ::NOISE_SAMPLE_STEP]
+    abs_lap = cv2.convertScaleAbs(cv2.Laplacian(sample, cv2.CV_16S))
+    # Median from the histogram, faster than np.median on the whole array
+    hist = cv2.calcHist([abs_lap], [0], None, [256], [0, 256]).ravel()
+    return int(np.searchsorted(np.cumsum(hist), abs_lap.size / 2))
+
+def preprocess_image(path: str, resize_width: int = 1600, debug: bool = DEBUG_OCR) -> np.ndarray:
     """
     Preprocesses an image to improve OCR accuracy.
     
     This function applies various image processing techniques to enhance text
     readability for the OCR engine. It handles resizing, grayscale conversion,
-    dark background detection, noise reduction, and adaptive thresholding.
+    dark background detection, noise reduction (only for noisy images), and
+    adaptive thresholding.
     
     Args:
         path (str): File path to the input image
         resize_width (int): Target width for image resizing (default: 1600)
+        debug (bool): Save the intermediate images to outputs/ (default: DEBUG_OCR)
     
     Returns:
         np.ndarray: Preprocessed image as a NumPy array ready for OCR
@@ -75,42 +292,54 @@ def preprocess_image(path: str, resize_width: int = 1600) -> np.ndarray:
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     
     # Detect if the image has dark background with light text
-    # Calculate average brightness of the image
-    mean_intensity = np.mean(gray)
+    # Calculate average brightness of the image (cv2.mean is faster than np.mean)
+    mean_intensity = cv2.mean(gray)[0]
     if mean_intensity < 100:  # If image is dark (dark background)
         # Invert colors: dark background becomes light, light text becomes dark
         # This helps OCR engines that expect dark text on light background
-        gray = cv2.bitwise_not(gray)
+        # The result is written in place to avoid allocating another image
+        cv2.bitwise_not(gray, dst=gray)
     
     # Save intermediate result for debugging purposes
-    cv2.imwrite("outputs/preprocessed-gray.jpg", gray)
+    if debug:
+        cv2.imwrite("outputs/preprocessed-gray.jpg", gray)
     
-    # Apply bilateral filter to reduce noise while preserving edges
-    # This smooths the image while keeping text edges sharp
-    # Parameters: image, diameter, sigmaColor, sigmaSpace
-    blur = cv2.bilateralFilter(gray, 9, 15, 15)
+    # Measure how noisy the image is
+    # Screenshots with digital text have a flat background with no noise
+    if _noise_level(gray) <= MAX_CLEAN_NOISE:
+        # Clean image: skip denoising and threshold the grayscale image directly
+        blur = gray
+    else:
+        # Noisy image (e.g. a photo): apply a light Gaussian blur to reduce noise
+        # A Gaussian filter is separable and much faster than a bilateral filter
+        blur = cv2.GaussianBlur(gray, (3, 3), 0)
     
     # Save blurred result for debugging
-    cv2.imwrite("outputs/preprocessed-blur.jpg", blur)
+    if debug:
+        cv2.imwrite("outputs/preprocessed-blur.jpg", blur)
     
     # Apply adaptive thresholding to create binary image (black and white)
     # This converts grayscale to pure black text on white background
     # Adaptive thresholding works better than fixed threshold for varying lighting
+    # The blurred image is no longer needed, so it is reused as the output buffer
     th = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                               cv2.THRESH_BINARY, 15, 8)
+                               cv2.THRESH_BINARY, 15, 8, dst=blur)
     
     # Save final preprocessed image for debugging
-    cv2.imwrite("outputs/preprocessed.jpg", th)
+    if debug:
+        cv2.imwrite("outputs/preprocessed.jpg", th)
     
     # Return the preprocessed binary image
-    return th
+    # It is passed straight to the OCR engine, so make sure it is a contiguous
+    # array (this is free when it already is, which is the usual case)
+    return np.ascontiguousarray(th)
 
 def image_to_text(path: str, lang_list=["en"], gpu: bool = True) -> str:
     """
     Extracts text from an image using OCR (Optical Character Recognition).
     
     This function takes an image file, preprocesses it to improve text recognition,
-    and then uses EasyOCR to extract all readable text from the image. It's
+    and then uses the OCR engine to extract all readable text from the image. It's
     specifically designed to handle exam question images.
     
     Args:
@@ -128,14 +357,9 @@ def image_to_text(path: str, lang_list=["en"], gpu: bool = True) -> str:
     # This applies filtering, thresholding, and other enhancements
     prep = preprocess_image(path)
     
-    # Convert the preprocessed NumPy array to PIL Image format
-    # EasyOCR can work with various formats, but PIL ensures compatibility
-    pil = Image.fromarray(prep)
-    
     # Perform OCR on the preprocessed image
-    # detail=0 returns only text (no bounding boxes or confidence scores)
-    # paragraph=True groups text into logical paragraphs
-    results = reader.readtext(np.array(pil), detail=0, paragraph=True)
+    # The preprocessed image is already a uint8 NumPy array, so it is passed as is
+    results = _read_text(reader, prep)
     
     # Join all extracted text pieces into a single string
     # Filter out empty strings and strip whitespace from each piece
@@ -143,4 +367,62 @@ def image_to_text(path: str, lang_list=["en"], gpu: bool = True) -> str:
     text = "\n".join([r.strip() for r in results if r.strip()])
     
     # Return the complete extracted text
-    return text
\ No newline at end of file
+    return text
+
+def _try_preprocess(path: str):
+    """
+    Preprocesses an image, logging the error instead of raising it.
+    
+    Args:
+        path (str): File path to the input image
+    
+    Returns:
+        np.ndarray or None: Preprocessed image, or None if it couldn't be loaded
+    """
+    try:
+        return preprocess_image(path)
+    except Exception as e:
+        print(f"Could not preprocess {path}: {e}")
+        return None
+
+def images_to_texts(paths: List[str], lang_list=["en"], gpu: bool = True, batch_size: int = 8) -> List[str]:
+    """
+    Extracts text from several images using batched OCR.
+    
+    The images are handled one batch at a time: each batch is preprocessed in
+    parallel threads (OpenCV releases the GIL while it works) and then read by
+    the OCR engine at once, which is much faster on a GPU than reading the
+    images one by one. Only one batch of preprocessed images is kept in memory.
+    
+    Args:
+        paths (list[str]): File paths to the images containing text to extract
+        lang_list (list): List of language codes for text recognition (default: ["en"])
+        gpu (bool): Whether to use GPU acceleration if available (default: True)
+        batch_size (int): Number of images read in each OCR batch (default: 8)
+    
+    Returns:
+        list[str]: Extracted text of each image, in the same order as paths
+                   (an empty string for images that couldn't be loaded)
+    """
+    # Initialize or get the cached OCR reader
+    reader = init_reader(lang_list=lang_list, gpu=gpu)
+    
+    texts = []
+    with ThreadPoolExecutor() as executor:
+        for start in range(0, len(paths), batch_size):
+            # Preprocess the images of this batch in parallel threads
+            # Images that can't be loaded are None and only skip themselves
+            preps = list(executor.map(_try_preprocess, paths[start:start + batch_size]))
+            batch = [prep for prep in preps if prep is not None]
+            
+            # Perform OCR on the preprocessed images of this batch
+            results_iter = iter(_read_texts(reader, batch, batch_size) if batch else [])
+            for prep in preps:
+                if prep is None:
+                    texts.append("")
+                    continue
+                # Join the text pieces of each image like image_to_text does
+                results = next(results_iter)
+                texts.append("\n".join([r.strip() for r in results if r.strip()]))
+    
+    return texts
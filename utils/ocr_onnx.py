@@ -0,0 +1,140 @@
+# ocr_onnx.py
+# This file runs the EasyOCR detector and recognizer models on ONNX Runtime
+# It exports both PyTorch models to ONNX once and then uses the OpenVINO execution
+# provider (when installed) which is faster than PyTorch on Intel CPUs
+
+# Import necessary libraries for model export and inference
+import os  # For building the paths of the exported models
+import torch  # PyTorch, used by EasyOCR and to export the models
+import onnxruntime as ort  # ONNX Runtime to run the exported models
+
+# Folder where the exported ONNX models are stored (next to EasyOCR's own models)
+ONNX_DIR = os.path.join(os.path.expanduser("~"), ".EasyOCR", "onnx")
+
+# Execution providers in order of preference; OpenVINO requires the
+# onnxruntime-openvino package, otherwise the default CPU provider is used
+PREFERRED_PROVIDERS = ["OpenVINOExecutionProvider", "CPUExecutionProvider"]
+
+
+class OnnxModule(torch.nn.Module):
+    """
+    PyTorch module that forwards its input to an ONNX Runtime session.
+
+    EasyOCR calls its models like PyTorch modules and reads PyTorch tensors back,
+    so this wrapper lets the ONNX models replace them without changing EasyOCR.
+    """
+
+    def __init__(self, session: ort.InferenceSession):
+        super().__init__()
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def forward(self, image, *args):
+        # Extra arguments (the recognizer's text placeholder) are not used by the models
+        outputs = self.session.run(None, {self.input_name: image.cpu().numpy()})
+        outputs = tuple(torch.from_numpy(output) for output in outputs)
+        return outputs if len(outputs) > 1 else outputs[0]
+
+
+class _ImageOnly(torch.nn.Module):
+    """Recognizer wrapper with a single image input, used only for the export."""
+
+    def __init__(self, recognizer: torch.nn.Module):
+        super().__init__()
+        self.recognizer = recognizer
+
+    def forward(self, image):
+        # The CTC recognizers ignore their text argument
+        return self.recognizer(image, None)
+
+
+def _create_session(path: str) -> ort.InferenceSession:
+    """
+    Loads an exported ONNX model with the fastest available execution provider.
+
+    Args:
+        path (str): Path to the .onnx file
+
+    Returns:
+        ort.InferenceSession: Session ready to run the model
+    """
+    available = ort.get_available_providers()
+    providers = [p for p in PREFERRED_PROVIDERS if p in available]
+    return ort.InferenceSession(path, providers=providers)
+
+
+def _load_or_export(module, dummy_input, path: str, output_names: list, dynamic_axes: dict):
+    """
+    Exports a PyTorch model to ONNX (only the first time) and wraps it in an OnnxModule.
+
+    Args:
+        module (torch.nn.Module): Model to export
+        dummy_input (torch.Tensor): Example input used to trace the model
+        path (str): Where the .onnx file is stored
+        output_names (list): Names given to the model outputs
+        dynamic_axes (dict): Input/output dimensions that can change between calls
+
+    Returns:
+        torch.nn.Module: OnnxModule running the exported model, or the original
+                         module if the export failed
+    """
+    try:
+        if not os.path.exists(path):
+            os.makedirs(ONNX_DIR, exist_ok=True)
+            module.eval()
+            with torch.no_grad():
+                torch.onnx.export(module, dummy_input, path, input_names=["image"],
+                                  output_names=output_names, dynamic_axes=dynamic_axes,
+                                  opset_version=17, dynamo=False)
+        return OnnxModule(_create_session(path))
+    except Exception as e:
+        # Keep the PyTorch model so OCR still works, just without the speedup
+        print(f"ONNX export of {os.path.basename(path)} failed, using PyTorch: {e}")
+        return module
+
+
+def use_onnx_runtime(reader):
+    """
+    Replaces the detector and recognizer of an EasyOCR reader with ONNX versions.
+
+    The reader must have been created with gpu=False and quantize=False, since
+    the ONNX models run on the CPU and dynamically quantized PyTorch models
+    can't be exported.
+
+    Args:
+        reader (easyocr.Reader): Reader whose models will be replaced
+
+    Returns:
+        easyocr.Reader: The same reader, now running on ONNX Runtime
+    """
+    # CRAFT text detector: takes any image size, returns score maps and features
+    detector_path = os.path.join(ONNX_DIR, f"detector_{reader.detect_network}.onnx")
+    reader.detector = _load_or_export(
+        reader.detector,
+        torch.randn(1, 3, 640, 640),
+        detector_path,
+        output_names=["y", "feature"],
+        dynamic_axes={
+            "image": {0: "batch", 2: "height", 3: "width"},
+            "y": {0: "batch", 1: "out_height", 2: "out_width"},
+            "feature": {0: "batch", 2: "out_height", 3: "out_width"},
+        },
+    )
+
+    # CRNN text recognizer: takes 64px-high text crops of any width
+    recognizer_path = os.path.join(ONNX_DIR, f"recognizer_{reader.model_lang}.onnx")
+    recognizer = _load_or_export(
+        _ImageOnly(reader.recognizer),
+        torch.randn(1, 1, 64, 256),
+        recognizer_path,
+        output_names=["preds"],
+        dynamic_axes={
+            "image": {0: "batch", 3: "width"},
+            "preds": {0: "batch", 1: "steps"},
+        },
+    )
+    # If the export failed, keep the original recognizer instead of the wrapper
+    if isinstance(recognizer, OnnxModule):
+        reader.recognizer = recognizer
+
+    return reader